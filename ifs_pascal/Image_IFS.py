@@ -2,11 +2,8 @@
 
 """
 
+import numpy as np
 from PIL import Image
-from matplotlib import pyplot as plt
-from math import sqrt
-from math import cos
-from math import sin
 from math import pi
 import logging
 
@@ -26,6 +23,14 @@ class Image_IFS(object):
     Alternatively, parametrized IFS can be loaded using 
     n_sierpinski() or polygon_ifs()
 
+    Images are scaled with nearest neighbor resampling by default, which 
+    keeps the edges of the attractor sharp and is much faster than PIL's 
+    smoothing filters at the cost of some aliasing. Pass resample to 
+    iterate() to use a smoothing filter instead.
+
+    Images are stored as RGBA arrays of dtype uint8 and only converted to 
+    PIL images when accessed through seed_image or image.
+
     Attributes:
         seed_image (PIL.Image): Image to be iterated under the IFS.
         image_size (int): Size of the output image.
@@ -44,7 +49,8 @@ class Image_IFS(object):
         """Constructor.
 
         Args:
-            seed_image (PIL.Image): Image to be iterated under the IFS.
+            seed_image (PIL.Image or np.ndarray): Image to be iterated under 
+                the IFS.
             image_size (int): Size of the output image.
             center_origin (bool): Controls if origin is at bottom left of image
                 or in the center.
@@ -55,30 +61,90 @@ class Image_IFS(object):
         """
         logger.debug('Creating new Image_IFS')
 
-        if seed_image == None:
+        self.image_size = image_size
+
+        if seed_image is None:
             # Use default seed image
             logger.debug('Using default seed image')
-            seed_image = _default_seed(image_size)
+            self._seed_array = _default_seed(image_size)
         else:
             # Resize given seed image
-            seed_image = seed_image.resize((image_size, image_size))
-        self.seed_image = seed_image
+            self._seed_array = self._to_array(seed_image)
 
-        # Image must be flipped to iterate so origin is at the bottom
-        self.image = _flip_vertical(self.seed_image)
-        self.flipped = True
-
-        self.image_size = image_size
+        self._array = self._seed_array
         self.center_origin = center_origin
         self.functions = []
+        # Scale, x_offset and y_offset in pixels of every function as 
+        # arrays, and where each function pastes, built lazily by 
+        # _finalize() and _paste_boxes(). _fn_key records the image_size, 
+        # center_origin and number of functions they were built for.
+        self._fn_key = None
+        self._fn_arrays = None
+        self._boxes = None
+        # Pair of working images for iterate(), allocated on first use
+        self._buffers = None
+
+
+    @property
+    def seed_image(self):
+        """PIL.Image: Image to be iterated under the IFS.
+
+        Each access builds a new PIL image from the stored array, and 
+        assigned images are resized to image_size. Assigning a seed image 
+        does not change the current image.
+
+        """
+        return Image.fromarray(self._seed_array)
+
+
+    @seed_image.setter
+    def seed_image(self, seed_image):
+        self._seed_array = self._to_array(seed_image)
+
+
+    @property
+    def image(self):
+        """PIL.Image: Output image that the IFS has been applied to.
+
+        Each access builds a new PIL image from the stored array, so edits 
+        to the returned image are not kept unless it is assigned back.
+
+        """
+        return Image.fromarray(self._array)
+
+
+    @image.setter
+    def image(self, image):
+        self._array = self._to_array(image)
+
+
+    def _to_array(self, image):
+        """Convert an image to the size and format used for iterating.
+
+        Args:
+            image (PIL.Image or np.ndarray): Image to convert.
+
+        Returns:
+            image_array (np.ndarray): RGBA image of shape 
+                (image_size, image_size, 4) and dtype uint8.
+
+        """
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        size_tuple = (self.image_size, self.image_size)
+        if image.size != size_tuple:
+            image = image.resize(size_tuple)
+
+        return np.asarray(image.convert('RGBA'))
 
 
     def add_function(self, scale, translation):
         """Add function to the IFS.
 
         Args:
-            scale (int): Positive integer scaling factor.
-            transformation (tuple of int): 2-tuple (x-offset, y-offset)
+            scale (float): Scaling factor as a fraction of the image size.
+            translation (tuple of float): 2-tuple (x-offset, y-offset) as 
+                fractions of the image size.
 
         Returns: 
             None.
@@ -87,74 +153,125 @@ class Image_IFS(object):
         self.functions.append((scale, translation))
 
 
-    def iterate(self, n_iterations):
+    def _finalize(self):
+        """Get the functions in the IFS in pixels as arrays.
+
+        The arrays are built for the current image_size and center_origin, 
+        and cached until either changes or another function is added. The 
+        paste boxes built from them are cleared when they are rebuilt.
+
+        Returns:
+            scales_px (np.ndarray): Scale of each function in pixels.
+            tx_px (np.ndarray): x-offset of each function in pixels.
+            ty_px (np.ndarray): y-offset of each function in pixels, from the 
+                top of the image. See _to_pixels().
+
+        """
+        key = (self.image_size, self.center_origin, len(self.functions))
+        if key != self._fn_key:
+            pixels = np.array([_to_pixels(scale, 
+                                          translation, 
+                                          self.image_size, 
+                                          self.center_origin)
+                               for scale, translation in self.functions], 
+                              dtype=np.int32).reshape(-1, 3)
+            self._fn_arrays = tuple(np.ascontiguousarray(values) 
+                                    for values in pixels.T)
+            self._boxes = None
+            self._fn_key = key
+
+        return self._fn_arrays
+
+
+    def _paste_boxes(self):
+        """Get where each function pastes its scaled image.
+
+        Boxes are clipped to the image, so this is only done once and cached 
+        along with the arrays from _finalize(). Functions whose scaled image is 
+        entirely outside of the image are left out.
+
+        Returns:
+            boxes (list of tuple): 2-tuple (scale, box) for each function, 
+                where box is a box as returned by _clip().
+
+        """
+        scales, x, y = self._finalize()
+        if self._boxes is None:
+            image_size = self.image_size
+
+            # Clip every function at once, as _clip() does for one
+            top = np.maximum(y, 0)
+            left = np.maximum(x, 0)
+            bottom = np.minimum(y + scales, image_size)
+            right = np.minimum(x + scales, image_size)
+            visible = (top < bottom) & (left < right)
+            boxes = np.stack([top, bottom, left, right, top - y, left - x], 
+                             axis=1)
+
+            self._boxes = [(scale, tuple(box)) for scale, box 
+                           in zip(scales[visible].tolist(), 
+                                  boxes[visible].tolist())]
+
+        return self._boxes
+
+
+    def iterate(self, n_iterations, resample=Image.NEAREST):
         """Apply the IFS to the current image and save to self.image.
 
         To display the resulting image, use display_image()
 
         Args:
             n_iterations (int): Number of times to apply the IFS.
-            first_call (bool): If this is the first time iterate is called,
-                image needs to be flipped so origin is at bottom left,
+            resample (int): PIL resampling filter used to scale the image, 
+                e.g. Image.NEAREST or Image.BICUBIC.
 
         Returns:
             None.
 
         """
-        image_size = self.image_size
-        size_tuple = (image_size, image_size)
-
-        if (n_iterations > 0):
-            center_origin = self.center_origin
-
-            if not self.flipped:
-                # Make sure origin is at the bottom
-                self.image = _flip_vertical(self.image)
-                self.flipped = True
-
-            start_image = self.image
-
-            # Create new transparent base image to put transformed copies on
-            new_image = Image.new('RGBA', size_tuple, (0,) * 4)
+        if n_iterations < 0:
+            return
 
-            # Apply each contraction in the IFS and combine results
-            for contraction in self.functions:
-                scale = int(contraction[0] * image_size)
-                current_image = start_image.resize((scale, scale))
+        image_size = self.image_size
 
-                # Optionally move origin to center
-                x_offset = scale if center_origin else 0
-                y_offset = scale if center_origin else 0
+        boxes = self._paste_boxes()
+        image_array = self._array
 
-                # Apply translation
-                x_offset += int(contraction[1][0] * image_size)
-                y_offset += int(contraction[1][1] * image_size)
+        if (n_iterations > 0) and ((self._buffers is None) or 
+                                   (self._buffers[0].shape[0] != image_size)):
+            # Working images are reused by every call to iterate()
+            self._buffers = [np.zeros((image_size, image_size, 4), 
+                                      dtype=np.uint8)
+                             for _ in range(2)]
 
-                # In order to have transparency mask so corners of the image 
-                # Don't cover parts of the attractor, we paste scaled image 
-                # onto a full size transparency and then paste that onto
-                # the actual image
-                transparency = Image.new('RGBA', size_tuple, (0,) * 4)
-                transparency.paste(current_image, (x_offset, y_offset))
-                new_image.paste(transparency, mask=transparency)
+        for iteration in range(n_iterations):
+            # Clear transparent base image to put transformed copies on. 
+            # Alternate buffers so the start image is never overwritten.
+            new_array = self._buffers[iteration % 2]
+            new_array.fill(0)
 
-            self.image = new_image
+            # Contractions often share the same scale, e.g. in n_sierpinski()
+            # and polygon_ifs(), so only resize once per distinct scale
+            resized = {}
 
-            # Recursively apply IFS for desired number of iterations
-            self.iterate(n_iterations - 1)
+            # Apply each contraction in the IFS
+            contractions = []
+            for scale, box in boxes:
+                if scale not in resized:
+                    resized[scale] = _resize(image_array, scale, resample)
+                contractions.append((resized[scale], box))
 
-        elif (n_iterations == 0):
-            # Last iteration
-            # Fill in transparency with black
-            background = Image.new('RGBA', size_tuple, (0, 0, 0, 255))
-            background.paste(self.image, mask=self.image)
+            # Combine results
+            _composite_all(new_array, contractions)
 
-            # Un-flip vertical axis
-            if self.flipped:
-                background = background.transpose(Image.FLIP_TOP_BOTTOM)
-                self.flipped = False
+            image_array = new_array
 
-            self.image = background
+        # Last iteration
+        # Fill in transparency with black
+        background = np.zeros((image_size, image_size, 4), dtype=np.uint8)
+        background[..., 3] = 255
+        _composite_over(background, image_array, 0, 0)
+        self._array = background
 
 
     def display_image(self):
@@ -164,12 +281,10 @@ class Image_IFS(object):
             None.
 
         """
-        image = self.image
-
-        if self.flipped:
-            image = _flip_vertical(image)
+        # Only import pyplot when needed since it is slow to import
+        from matplotlib import pyplot as plt
 
-        plt.imshow(image)
+        plt.imshow(self._array)
         plt.axis('off')
         plt.show()
 
@@ -193,15 +308,9 @@ def n_sierpinski(seed_image=None, image_size=512, n=2):
                              image_size=image_size,
                              center_origin=False)
     scale = 1 / n
-    # Precompute 2n, sqrt(3), and i*sqrt(3) for efficiency
-    n2 = 2 * n
-    sqrt3 = sqrt(3)
-    for i in range(0, n):
-        isqrt3 = i * sqrt3
-        for j in range(0, n - i):
-            x_offset = (i + (2 * j)) / n2 
-            y_offset = isqrt3 / n2 
-            n_sierpinski.add_function(scale, (x_offset, y_offset))
+    x_offsets, y_offsets = _sierpinski_translations(n)
+    for x_offset, y_offset in zip(x_offsets, y_offsets):
+        n_sierpinski.add_function(scale, (x_offset, y_offset))
     
     return n_sierpinski
 
@@ -233,15 +342,70 @@ def polygon_ifs(seed_image=None,
     scale = 2 / n_vertices
     # omega = (2*pi) / n_vertices
     omega = pi * scale
-    for k in range(0, n_vertices):
-        polygon_ifs.add_function(scale, 
-                            (scale * cos(omega * k), scale * sin(omega * k)))
+    angles = omega * np.arange(n_vertices)
+    x_offsets = scale * np.cos(angles)
+    y_offsets = scale * np.sin(angles)
+    for x_offset, y_offset in zip(x_offsets.tolist(), y_offsets.tolist()):
+        polygon_ifs.add_function(scale, (x_offset, y_offset))
     if include_center:
         polygon_ifs.add_function(scale, (0, 0))
 
     return polygon_ifs
 
 
+def _sierpinski_translations(n):
+    """Compute translations of the IFS for an n-row Sierpinski gasket.
+
+    Args:
+        n (int): Number of rows in each basic structure of the triangle.
+
+    Returns:
+        x_offsets (list of float): x-offset of each function.
+        y_offsets (list of float): y-offset of each function.
+
+    """
+    # Function (i, j) is the jth copy in the ith row of the basic structure
+    i, j = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    in_triangle = j < (n - i)
+    i = i[in_triangle]
+    j = j[in_triangle]
+    x_offsets = (i + (2 * j)) / (2 * n)
+    y_offsets = (i * np.sqrt(3)) / (2 * n)
+
+    return x_offsets.tolist(), y_offsets.tolist()
+
+
+def _to_pixels(scale, translation, image_size, center_origin):
+    """Convert an IFS function to pixels.
+
+    Args:
+        scale (float): Scaling factor as a fraction of the image size.
+        translation (tuple of float): 2-tuple (x-offset, y-offset) as 
+            fractions of the image size.
+        image_size (int): Size of the output image.
+        center_origin (bool): Controls if origin is at bottom left of image
+            or in the center.
+
+    Returns:
+        pixels (tuple of int): 3-tuple (scale, x_offset, y_offset) in pixels.
+            Translations are measured up from the bottom of the image, but 
+            the returned offsets are measured down from the top of the image 
+            so images never need to be flipped.
+
+    """
+    scale = int(scale * image_size)
+    x_offset = int(translation[0] * image_size)
+    y_offset = int(translation[1] * image_size)
+    if center_origin:
+        # Move origin to center
+        x_offset += scale
+        y_offset += scale
+    # Move origin to the top, where the top edge of the scaled image goes
+    y_offset = image_size - scale - y_offset
+
+    return (scale, x_offset, y_offset)
+
+
 def _default_seed(image_size):
     """Create image of white square.
 
@@ -249,20 +413,114 @@ def _default_seed(image_size):
         image_size (int): Size of the image.
 
     Returns:
-        image (PIL.Image): Image of all white pixels. 
+        image (np.ndarray): RGBA image of all white pixels. 
+
+    """
+    return np.full((image_size, image_size, 4), 255, dtype=np.uint8)
+
+
+def _resize(image_array, size, resample):
+    """Resize a square image.
+
+    For nearest neighbor resampling, if the image size is a multiple of the 
+    new size then every factor-th pixel is taken without going through PIL.
+
+    Args:
+        image_array (np.ndarray): Square RGBA image of dtype uint8.
+        size (int): Size of the resized image.
+        resample (int): PIL resampling filter.
+
+    Returns:
+        resized (np.ndarray): Resized RGBA image of dtype uint8.
+
+    """
+    image_size = image_array.shape[0]
+    if (resample == Image.NEAREST) and (size > 0) \
+            and (image_size % size == 0):
+        factor = image_size // size
+        # Take the pixel nearest the center of each factor x factor block
+        start = factor // 2
+        return image_array[start : : factor, start : : factor]
+
+    resized = Image.fromarray(image_array).resize((size, size), resample)
+    return np.asarray(resized)
+
+
+def _clip(dst_shape, src_shape, x, y):
+    """Find the part of src that lands inside dst when pasted at (x, y).
+
+    Args:
+        dst_shape (tuple of int): (height, width) of the destination image.
+        src_shape (tuple of int): (height, width) of the pasted image.
+        x (int): Column of dst where the left edge of src goes.
+        y (int): Row of dst where the top edge of src goes.
+
+    Returns:
+        box (tuple of int): 6-tuple (top, bottom, left, right, src_top, 
+            src_left). Rows top:bottom and columns left:right of dst are 
+            covered by src, starting from row src_top and column src_left of 
+            src. None if src is entirely outside of dst.
+
+    """
+    top = max(y, 0)
+    left = max(x, 0)
+    bottom = min(y + src_shape[0], dst_shape[0])
+    right = min(x + src_shape[1], dst_shape[1])
+    if (top >= bottom) or (left >= right):
+        return None
+
+    return (top, bottom, left, right, top - y, left - x)
+
+
+def _composite_over(dst, src, x, y):
+    """Paste src onto dst in place, using the alpha channel of src as a mask.
+
+    Matches PIL's Image.paste(src, (x, y), mask=src), including rounding.
+    Parts of src that fall outside of dst are clipped.
+
+    Args:
+        dst (np.ndarray): RGBA image of shape (H, W, 4) and dtype uint8.
+        src (np.ndarray): RGBA image of shape (h, w, 4) and dtype uint8.
+        x (int): Column of dst where the left edge of src goes.
+        y (int): Row of dst where the top edge of src goes.
+
+    Returns:
+        None.
 
     """
-    return Image.new("RGBA", (image_size, image_size), (255,) * 4)
+    box = _clip(dst.shape[:2], src.shape[:2], x, y)
+    if box is not None:
+        _composite_all(dst, [(src, box)])
 
 
-def _flip_vertical(image):
-    """Perform vertical flip of image.
+def _composite_all(dst, contractions):
+    """Paste each contraction onto dst in place, in order.
 
     Args:
-        image (PIL.Image): Image to flip.
+        dst (np.ndarray): RGBA image of shape (H, W, 4) and dtype uint8.
+        contractions (iterable of tuple): Each contraction is a 2-tuple 
+            (src, box), where box is where src goes as returned by _clip().
 
     Returns:
-        flipped (PIL.Image): Flipped image.
+        None.
 
     """
-    return image.transpose(Image.FLIP_TOP_BOTTOM)
+    for src, (top, bottom, left, right, src_top, src_left) in contractions:
+        region = dst[top : bottom, left : right]
+        src = src[src_top : src_top + (bottom - top), 
+                  src_left : src_left + (right - left)]
+
+        # Use alpha channel as a mask so corners of the image 
+        # don't cover parts of the attractor
+        alpha = src[..., 3:]
+        if np.all(alpha == 255):
+            # Opaque source covers the destination
+            region[...] = src
+            continue
+
+        src = src.astype(np.uint16)
+        alpha = src[..., 3:]
+
+        # Blend and divide by 255 with rounding, as PIL does
+        blended = region * (255 - alpha) + src * alpha + 128
+        region[...] = ((blended >> 8) + blended) >> 8
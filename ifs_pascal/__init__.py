@@ -5,3 +5,5 @@ from .Image_IFS import n_sierpinski
 from .Image_IFS import polygon_ifs
 
 from .utils import choose
+from .utils import pascal_mod_m
+from .utils import pascal_mod_p
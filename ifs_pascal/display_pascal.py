@@ -4,9 +4,8 @@
 
 import logging
 import numpy as np
-from matplotlib import pyplot as plt
 
-from .utils import choose
+from .utils import pascal_mod_m
 from .utils import raise_value_error
 
 logger = logging.getLogger('ifs_pascal.display_pascal')
@@ -24,7 +23,8 @@ def display_pascal(modulus=2,
 
     Args:
         modulus (int): Image creates is Pascal's triangle modulo this number.
-        n_rows (int): Number of rows of Pascal's triangle to draw.
+        n_rows (int): Number of rows of Pascal's triangle to draw. Must be
+            positive.
         scale (int): Must be an even number. Each number of the triangle takes 
             up a square of (scale) x (scale) pixels. Image size will be 
             (n_rows*scale) x (n_rows*scale).
@@ -37,38 +37,39 @@ def display_pascal(modulus=2,
             http://matplotlib.org/examples/color/colormaps_reference.html
 
     Returns:
-        image (np.ndarray): Square image of Pascal's triangle modulo m.
+        image (np.ndarray): Square image of Pascal's triangle modulo m. The
+            dtype is uint8 unless the modulus is too large for it.
 
     """
     if (scale % 2) != 0:
         raise_value_error('Scale must be an even number, but it was %d' % scale)
+    if n_rows < 1:
+        raise_value_error('Number of rows must be positive, but it was %d' \
+                          % n_rows)
     # Create the image
     image_size = scale * n_rows
 
     logger.debug("Creating image of Pascal's triangle mod %d of size " \
                  "%d." % (modulus, image_size))
 
-    image = np.zeros((image_size, image_size))
-    for n in range(0, n_rows + 1):
-        row_start = scale * n
-        # nth row of Pascal's triangle is nCk for k = 0, 1, ..., n
-        for k in range(0, n + 1):
-            num = choose(n, k)
-            color = num % modulus
-            if mode == "binary":
-                # Only two colors in binary mode
-                color = (color != 0)
-            # Calculate where in the image the current entry should be
-            left_end = \
-                (image_size // 2) - ((scale // 2) * (n + 1)) + (scale * k)
-            # Fill square of pixels with color for current entry
-            image[row_start : row_start + scale, \
-                  left_end : left_end + scale] = color
+    # Row n of Pascal's triangle is nCk for k = 0, 1, ..., n. Only rows
+    # 0, ..., n_rows - 1 fit in the image.
+    triangle = pascal_mod_m(n_rows - 1, modulus)
+    if mode == "binary":
+        # Only two colors in binary mode
+        triangle = (triangle != 0).astype(np.uint8)
+    else:
+        # Use the smallest dtype that holds every congruence class
+        triangle = triangle.astype(np.min_scalar_type(modulus - 1))
+
+    image = _fill_pascal(triangle, scale)
     
     # Display the image
     if display:
         logger.debug('Displaying image.')
 
+        # Only import pyplot when needed since it is slow to import
+        from matplotlib import pyplot as plt
         plt.imshow(image)
         plt.axis('off')
         plt.set_cmap(colormap)
@@ -78,3 +79,41 @@ def display_pascal(modulus=2,
         logger.debug('Image will not be displayed.')
 
     return image
+
+
+def _fill_pascal(triangle, scale):
+    """Draw Pascal's triangle as a centered image.
+
+    Each entry of the triangle fills a square of (scale) x (scale) pixels.
+    Row n of the triangle is shifted right by (scale / 2) * (n_rows - 1 - n) 
+    pixels so the rows are centered, so every square starts at a multiple of 
+    scale / 2. The entries are placed on a grid of half-squares first and 
+    then the grid is expanded to pixels in one pass.
+
+    Args:
+        triangle (np.ndarray): Array of shape (n_rows, n_rows) whose entry 
+            [n, k] is the color for nCk. Entries with k > n are ignored.
+        scale (int): Even number of pixels per entry.
+
+    Returns:
+        image (np.ndarray): Square image of size (n_rows*scale).
+
+    """
+    n_rows = triangle.shape[0]
+    n, k = np.tril_indices(n_rows)
+    colors = triangle[n, k]
+
+    # The grid starts out as zeros, so only nonzero entries need to be placed
+    nonzero = colors != 0
+    n = n[nonzero]
+    k = k[nonzero]
+    colors = colors[nonzero]
+
+    # Calculate which half-square each entry starts at
+    left_end = (n_rows - 1 - n) + (2 * k)
+    half_squares = np.zeros((n_rows, 2 * n_rows), dtype=triangle.dtype)
+    half_squares[n, left_end] = colors
+    half_squares[n, left_end + 1] = colors
+
+    image = np.repeat(half_squares, scale, axis=0)
+    return np.repeat(image, scale // 2, axis=1)
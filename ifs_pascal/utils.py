@@ -5,8 +5,6 @@
 import logging
 import numpy as np
 
-from math import factorial
-
 logger = logging.getLogger('ifs_pascal.utils')
 
 
@@ -29,9 +27,124 @@ def choose(n, k):
     if n < 0:
         raise_value_error("Need n>0 but n=%d" % n)
     if k < 0:
-        raise_value_error("Need k>0 but k=%d" %d)
+        raise_value_error("Need k>0 but k=%d" % k)
+
+    # nCk = nC(n-k), so use whichever needs fewer multiplications
+    k = min(k, n - k)
+    # Each partial product is itself a binomial coefficient, so the 
+    # division is always exact
+    result = 1
+    for i in range(1, k + 1):
+        result = (result * (n - k + i)) // i
+
+    return result
+
+
+def is_prime(n):
+    """Check if n is a prime number using trial division.
+
+    Args:
+        n (int): Integer to check.
+
+    Returns:
+        is_prime (bool): True if n is prime.
+
+    """
+    if n < 2:
+        return False
+    i = 2
+    while i * i <= n:
+        if n % i == 0:
+            return False
+        i += 1
+    return True
+
+
+def pascal_mod_p(n_rows, p):
+    """Compute the first n_rows + 1 rows of Pascal's triangle modulo a prime p.
+
+    By Lucas' theorem, nCk mod p is the product of (n_i)C(k_i) mod p over the 
+    base-p digits n_i, k_i of n and k. 
+    See https://en.wikipedia.org/wiki/Lucas%27s_theorem
+    So the first p^(d+1) rows are p x p blocks, where block (a, b) is the 
+    first p^d rows multiplied by aCb mod p. The triangle is built up one 
+    digit at a time by copying blocks, only filling blocks that are nonzero 
+    and inside the first n_rows + 1 rows.
 
-    return int(factorial(n) // (factorial(k) * factorial(n - k)))
+    Args:
+        n_rows (int): Last row of Pascal's triangle to compute.
+        p (int): Prime modulus.
+
+    Returns:
+        triangle (np.ndarray): Array of shape (n_rows + 1, n_rows + 1) whose
+            entry [n, k] is nCk mod p for k <= n and 0 for k > n.
+
+    """
+    if not is_prime(p):
+        raise_value_error("Need p prime but p=%d" % p)
+    if n_rows < 0:
+        raise_value_error("Need n_rows>=0 but n_rows=%d" % n_rows)
+
+    size = n_rows + 1
+    # Products of two entries are at most (p-1)^2
+    dtype = np.min_scalar_type((p - 1) ** 2)
+
+    # Small table of aCb mod p for digits a, b
+    table = pascal_mod_m(min(p, size) - 1, p).astype(dtype)
+
+    triangle = table
+    while triangle.shape[0] < size:
+        block_size = triangle.shape[0]
+        new_size = min(p * block_size, size)
+        new_triangle = np.zeros((new_size, new_size), dtype=dtype)
+        n_blocks = -(-new_size // block_size)
+        for a in range(n_blocks):
+            top = a * block_size
+            height = min(block_size, new_size - top)
+            # Blocks with b > a are 0
+            for b in range(a + 1):
+                if table[a, b] == 0:
+                    continue
+                left = b * block_size
+                width = min(block_size, new_size - left)
+                block = new_triangle[top : top + height, left : left + width]
+                np.multiply(triangle[:height, :width], table[a, b], out=block)
+                block %= p
+        triangle = new_triangle
+
+    return triangle
+
+
+def pascal_mod_m(n_rows, modulus):
+    """Compute the first n_rows + 1 rows of Pascal's triangle modulo m.
+
+    Each row is built from the previous one using Pascal's rule 
+    nCk = (n-1)C(k-1) + (n-1)Ck, reducing modulo m at each step.
+
+    Args:
+        n_rows (int): Last row of Pascal's triangle to compute.
+        modulus (int): Positive integer modulus.
+
+    Returns:
+        triangle (np.ndarray): Array of shape (n_rows + 1, n_rows + 1) whose
+            entry [n, k] is nCk mod m for k <= n and 0 for k > n.
+
+    """
+    if modulus < 1:
+        raise_value_error("Need modulus>0 but modulus=%d" % modulus)
+    if n_rows < 0:
+        raise_value_error("Need n_rows>=0 but n_rows=%d" % n_rows)
+
+    # Sums of two entries are at most 2(m-1)
+    dtype = np.min_scalar_type(2 * (modulus - 1))
+    triangle = np.zeros((n_rows + 1, n_rows + 1), dtype=dtype)
+    triangle[:, 0] = 1 % modulus
+    for n in range(1, n_rows + 1):
+        row = triangle[n, 1:]
+        np.add(triangle[n - 1, 1:], triangle[n - 1, :-1], out=row)
+        row %= modulus
+
+    return triangle
 
 
 def raise_value_error(msg):